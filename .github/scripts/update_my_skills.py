@@ -15,13 +15,27 @@ Behavior:
   Misc tools, Services & Frameworks, Databases, DevOps).
 - Exclude package managers and forbidden skills from badges.
 - Safe commit: only commit & push when README changed; otherwise skip commit.
+- Optional sharding: `--shard i/n --output part.json` analyzes repos[i::n] only;
+  `--merge part*.json` builds the README from the shard outputs.
+  Shards read the per-repo cache but do not write it back.
 """
 
+import argparse
+import base64
+import hashlib
+import json
 import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
+import subprocess
+import sys
+import threading
 import time
 import urllib.parse
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 GITHUB_API = "https://api.github.com"
 OWNER = os.getenv("OWNER")
@@ -44,10 +58,30 @@ elif ACCESS_TOKEN:
     TOKENS.append(ACCESS_TOKEN)
 # If TOKENS is empty, we will fall back to unauthenticated public repo listing (requires OWNER)
 
+GITHUB_GRAPHQL = f"{GITHUB_API}/graphql"
 REQUEST_TIMEOUT = 30
+# retries for a request that was throttled (403/429) or hit a 5xx
+MAX_RETRIES = 5
+# file aliases per GraphQL query (keeps each query well under GitHub's node limits)
+GRAPHQL_FILE_BATCH = 50
+# only the head of each file is scanned; skill keywords live in manifests/headers, not deep payloads
+MAX_FILE_BYTES = 256 * 1024
+# parallel contents requests per repo (kept low to stay clear of secondary rate limits)
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "10"))
+# repos analyzed in parallel
+REPO_CONCURRENCY = int(os.getenv("REPO_CONCURRENCY", "8"))
 # map repo_str -> token that discovered it
 repo_token_map = {}
 
+# On-disk cache carried between workflow runs:
+#   "etags": request key -> {"etag", "body"} for conditional GETs (304s don't count against the rate limit)
+#   "repos": "owner/name" -> {"sha", "table_version", "detected"} so repos whose default-branch HEAD
+#            is unchanged (and were analyzed with the same tables) are not re-analyzed
+# Lookups read prev_cache; everything used in this run is written to next_cache, which is what gets saved.
+CACHE_PATH = os.getenv("SKILLS_CACHE_PATH", ".skills_cache.json")
+prev_cache = {"etags": {}, "repos": {}}
+next_cache = {"etags": {}, "repos": {}}
+
 # --- detection heuristics maps ---
 FILE_TOOL_MAP = {
     "package.json": ["nodejs"],
@@ -68,11 +102,39 @@ FILE_TOOL_MAP = {
     "webpack.config.js": ["webpack"],
     "Cargo.toml": ["rust"],
 }
+# basenames are compared lowercased, so normalize the keys once ("Gemfile", "Cargo.toml", ...)
+FILE_TOOL_MAP = {k.lower(): v for k, v in FILE_TOOL_MAP.items()}
 
 PACKAGE_MANAGERS = {
     "npm", "yarn", "pip", "pipenv", "poetry", "composer", "cargo", "bundler", "gem"
 }
 
+# vendored / generated directories whose files don't reflect the author's own stack
+DENY_PREFIXES = (
+    "node_modules/", "venv/", ".venv/", "vendor/", "third_party/", "dist/", "build/",
+    ".git/", "site-packages/", "__pycache__/", ".mypy_cache/", "docs/_build/", ".tox/",
+    ".next/", "target/",
+)
+
+DENY_RE = re.compile(r"(?:^|/)(?:" + "|".join(re.escape(d) for d in DENY_PREFIXES) + ")")
+
+# which tree paths are worth fetching, precomputed so the per-path test is a set lookup plus two regex searches:
+# exact basenames (manifests, env/db config, Chef metadata) ...
+CANDIDATE_NAMES = frozenset(set(FILE_TOOL_MAP) | {
+    ".env", ".env.example", ".env.sample", "database.yml", "database.yaml", "application.yml", "config.yml",
+    "metadata.rb", "berksfile",
+})
+# ... basename suffixes / fragments (terraform, sql, docker, cloud & ops config) ...
+CANDIDATE_BASENAME_RE = re.compile(
+    r"\.(?:tf|sql)$|chart\.yaml$|dockerfile|cloudformation|serverless\.ya?ml|azure-pipelines\.yml|cloudbuild\.yaml"
+    r"|sam\.yaml|prometheus\.yml|grafana\.ini|nginx\.conf|consul\.hcl|berksfile"
+)
+# ... and directories (Chef recipes, Helm charts)
+CANDIDATE_PATH_RE = re.compile(r"/recipes/|/charts/")
+
+# upper bound on content fetches per repo (dependency manifests are kept first)
+MAX_FETCH = 80
+
 # skills to exclude
 FORBIDDEN_SKILLS = {
     "Jupyter Notebook", "Dockerfile", "CSS", "HTML", "Shell"
@@ -147,31 +209,148 @@ DEVOPS_KEYWORDS = {
     "consul": "Consul",
 }
 
-LANGUAGE_NORMALIZE = {
-    "JavaScript": "JavaScript",
-    "TypeScript": "TypeScript",
-    "Python": "Python",
-    "Go": "Go",
-    "Java": "Java",
-    "C#": "C#",
-    "C++": "C++",
-    "Ruby": "Ruby",
-    "PHP": "PHP",
-    "Rust": "Rust",
-    "Shell": "Shell",
-    "HTML": "HTML",
-    "CSS": "CSS",
+# additional devops signals (Terraform providers, cloud tooling, ops config files)
+CLOUD_PATTERNS = {
+    'provider "aws"': "AWS",
+    'provider "google"': "GCP",
+    'provider "google-beta"': "GCP",
+    'provider "azurerm"': "Azure",
+    "cloudformation": "AWS",
+    "serverless": "AWS",
+    "sam": "AWS",
+    "gcloud": "GCP",
+    "google cloud": "GCP",
+    "azurerm": "Azure",
+    "azure-pipelines": "Azure",
 }
-
-category_map = {
-    "Programming languages": Counter(),
-    "Frontend development": Counter(),
-    "Misc tools": Counter(),
-    "Services & Frameworks": Counter(),
-    "Databases": Counter(),
-    "DevOps": Counter(),
+OPS_PATTERNS = {
+    "prometheus": "Prometheus",
+    "grafana": "Grafana",
+    "nginx": "Nginx",
+    "chef": "Chef",
+    "consul": "Consul",
+    "prometheus.yml": "Prometheus",
+    "grafana.ini": "Grafana",
+    "consul.hcl": "Consul",
+    "berksfile": "Chef",
+    "recipes/": "Chef",
+    "cookbook": "Chef",
 }
 
+# content is lowercased before scanning, so normalize every keyword map once at import
+DB_KEYWORDS = {k.lower(): v for k, v in DB_KEYWORDS.items()}
+FRONTEND_KEYWORDS = {k.lower(): v for k, v in FRONTEND_KEYWORDS.items()}
+SERVICE_KEYWORDS = {k.lower(): v for k, v in SERVICE_KEYWORDS.items()}
+DEVOPS_KEYWORDS = {k.lower(): v for k, v in DEVOPS_KEYWORDS.items()}
+CLOUD_PATTERNS = {k.lower(): v for k, v in CLOUD_PATTERNS.items()}
+OPS_PATTERNS = {k.lower(): v for k, v in OPS_PATTERNS.items()}
+
+# every (keyword, detected-category, label) the content scan looks for
+KEYWORD_TABLE = tuple(
+    (k, cat, label)
+    for cat, keywords_map in (
+        ("dbs", DB_KEYWORDS),
+        ("frontend", FRONTEND_KEYWORDS),
+        ("services", SERVICE_KEYWORDS),
+        ("devops", DEVOPS_KEYWORDS),
+        ("devops", CLOUD_PATTERNS),
+        ("devops", OPS_PATTERNS),
+    )
+    for k, label in keywords_map.items()
+)
+
+# linguist languages that never come with manifests worth fetching; repos with only these are not scanned
+# (Shell, Dockerfile and Jupyter Notebook stay scannable: they carry devops / dependency signals)
+NON_CODE_LANGUAGES = frozenset({"HTML", "CSS", "SCSS", "Markdown", "TeX", "Text"})
+
+# Detection is a pure function of (HEAD commit, these tables); cached per-repo results are keyed on both.
+# Table edits change the hash automatically; bump DETECTION_REVISION when detection logic changes.
+DETECTION_REVISION = 4
+TABLE_VERSION = hashlib.sha1(
+    repr((DETECTION_REVISION, KEYWORD_TABLE, sorted(FILE_TOOL_MAP.items()), DENY_PREFIXES, MAX_FETCH, MAX_FILE_BYTES,
+          sorted(NON_CODE_LANGUAGES), sorted(FORBIDDEN_SKILLS), sorted(CANDIDATE_NAMES),
+          CANDIDATE_BASENAME_RE.pattern, CANDIDATE_PATH_RE.pattern)).encode()
+).hexdigest()[:12]
+
+# --- rate limiting driven by GitHub's X-RateLimit-* response headers ---
+class RateLimiter:
+    """
+    Tracks each quota GitHub reports separately: one window per (token, X-RateLimit-Resource), since every
+    token in ACCESS_TOKENS has its own core / graphql / ... limits. Shared by all workers.
+    """
+
+    def __init__(self):
+        self.windows = {}  # (token, resource) -> [remaining, reset epoch, next free send slot]
+        self.lock = threading.Lock()
+
+    def note(self, resp, token=None):
+        key = (token, resp.headers.get("X-RateLimit-Resource", "core"))
+        if "X-RateLimit-Remaining" not in resp.headers:
+            return
+        remaining = int(resp.headers["X-RateLimit-Remaining"])
+        reset = int(resp.headers.get("X-RateLimit-Reset", 0))
+        with self.lock:
+            window = self.windows.setdefault(key, [remaining, reset, 0.0])
+            if reset > window[1]:
+                window[0], window[1] = remaining, reset  # a new window started
+            else:
+                # responses arrive after later sends were reserved; never give back quota those already claimed
+                window[0] = min(window[0], remaining)
+
+    def wait(self, resource="core", token=None):
+        """
+        Reserve the next send for `resource` under `token` and sleep until it is due.
+        Once fewer than 50 calls remain, sends are spaced evenly over the rest of the window; each caller
+        claims its own slot under the lock, so concurrent workers queue up instead of firing together.
+        """
+        with self.lock:
+            window = self.windows.get((token, resource))
+            if window is None:
+                return
+            remaining, reset, next_slot = window
+            now = time.time()
+            if remaining >= 50:
+                window[0] -= 1
+                return
+            if remaining > 0:
+                slot = max(now, next_slot)
+                window[2] = slot + max(0, reset - slot + 1) / remaining
+                window[0] -= 1
+            else:
+                # quota spent: wait for the reset, then one call a second until a response reports the new window
+                slot = max(next_slot, reset + 1)
+                window[2] = slot + 1
+        time.sleep(max(0, slot - now))
+
+    def retry_delay(self, resp, attempt):
+        """
+        Seconds to wait before retrying `resp`, or None if it should not be retried.
+        Throttled responses (429, rate-limited 403) and 5xx are retried; Retry-After / X-RateLimit-Reset
+        are honored when present, otherwise back off exponentially (1s, 2s, ... 32s).
+        """
+        status = resp.status_code
+        throttled = status == 429 or (status == 403 and (
+            "Retry-After" in resp.headers
+            or resp.headers.get("X-RateLimit-Remaining") == "0"
+            or "rate limit" in resp.text.lower()
+        ))
+        if not throttled and status < 500:
+            return None
+        if resp.headers.get("Retry-After"):
+            try:
+                return int(resp.headers["Retry-After"])
+            except ValueError:
+                pass
+        if resp.headers.get("X-RateLimit-Remaining") == "0":
+            return max(0, int(resp.headers.get("X-RateLimit-Reset", time.time())) - time.time()) + 1
+        return min(2 ** attempt, 32)
+
+rate_limiter = RateLimiter()
+
+# one keep-alive session for every API call; the pool is sized for repo x file concurrency
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=REPO_CONCURRENCY * FETCH_CONCURRENCY))
+
 # --- helpers for API calls with optional token override ---
 def mk_headers(token=None):
     headers = {"Accept": "application/vnd.github.v3+json"}
@@ -179,12 +358,89 @@ def mk_headers(token=None):
         headers["Authorization"] = f"token {token}"
     return headers
 
-def api_get(path, params=None, token=None):
+def send(method, url, token=None, resource="core", **kwargs):
+    """
+    Issue a request through the shared session, pacing on `token`'s rate-limit headers and retrying throttled/5xx calls.
+    `token` only selects the quota to pace on; the caller still passes its Authorization header.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.wait(resource, token)
+        r = session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+        rate_limiter.note(r, token)
+        delay = rate_limiter.retry_delay(r, attempt)
+        if delay is None or attempt == MAX_RETRIES:
+            return r
+        print(f"HTTP {r.status_code} on {url}; retrying in {delay:.0f}s")
+        time.sleep(delay)
+    return r
+
+def load_cache():
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        prev_cache["etags"] = data.get("etags", {})
+        prev_cache["repos"] = data.get("repos", {})
+    except (OSError, ValueError, AttributeError):
+        pass
+
+def save_cache():
+    with open(CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump(next_cache, f, ensure_ascii=False)
+
+def etag_key(url, params=None, token=None):
+    """
+    Cache key for a GET. /user/... answers depend on who is asking, so those keys carry a hash of the token
+    (never the token itself); repo and blob URLs return the same body for every token and stay shared.
+    """
+    if params:
+        url += "?" + urllib.parse.urlencode(sorted(params.items()))
+    if token and url.startswith(f"{GITHUB_API}/user/"):
+        url += "#" + hashlib.sha256(token.encode()).hexdigest()[:16]
+    return url
+
+def conditional_get(url, headers, params=None, token=None):
+    """
+    GET with If-None-Match from the ETag cache.
+    Returns (response, cached_entry); on 304 the caller should use cached_entry["body"].
+    """
+    key = etag_key(url, params, token)
+    entry = prev_cache["etags"].get(key) or next_cache["etags"].get(key)
+    if entry:
+        headers = dict(headers, **{"If-None-Match": entry["etag"]})
+    r = send("GET", url, token=token, headers=headers, params=params)
+    if r.status_code == 304 and entry:
+        next_cache["etags"][key] = entry
+    return r, entry
+
+def store_etag(r, url, params, body, token=None):
+    if r.headers.get("ETag"):
+        next_cache["etags"][etag_key(url, params, token)] = {"etag": r.headers["ETag"], "body": body}
+
+def api_get(path, params=None, token=None, remember=True):
+    """GET a JSON API path; `remember=False` skips storing the body (large, rarely re-requested responses)."""
     url = f"{GITHUB_API}{path}"
     headers = mk_headers(token=token)
-    r = requests.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+    r, entry = conditional_get(url, headers, params=params, token=token)
+    if r.status_code == 304 and entry:
+        return entry["body"]
+    r.raise_for_status()
+    data = r.json()
+    if remember:
+        store_etag(r, url, params, data, token)
+    return data
+
+def graphql(query, variables=None, token=None):
+    """
+    POST a GraphQL query (requires a token) and return its `data` object.
+    Any error raises, even alongside partial data, so callers fall back to REST instead of using a partial answer.
+    """
+    r = send("POST", GITHUB_GRAPHQL, token=token, resource="graphql", headers=mk_headers(token=token),
+             json={"query": query, "variables": variables or {}})
     r.raise_for_status()
-    return r.json()
+    payload = r.json()
+    if payload.get("errors"):
+        raise RuntimeError(payload["errors"][0].get("message", "GraphQL error"))
+    return payload.get("data") or {}
 
 # --- list repos discovered by each token ---
 def list_repos_for_token(token):
@@ -203,8 +459,6 @@ def list_repos_for_token(token):
         if len(data) < per_page:
             break
         page += 1
-        # small sleep to be polite
-        time.sleep(0.05)
     return repos
 
 def list_public_user_repos(owner):
@@ -234,8 +488,10 @@ def list_all_repos():
     repo_set = set()
     # if tokens given, gather per token
     if TOKENS:
-        for token in TOKENS:
-            api_items = list_repos_for_token(token)
+        # list every token's repos concurrently; zip keeps TOKENS order, so the first token still wins
+        with ThreadPoolExecutor(max_workers=len(TOKENS)) as pool:
+            per_token = list(pool.map(list_repos_for_token, TOKENS))
+        for token, api_items in zip(TOKENS, per_token):
             for r in api_items:
                 try:
                     if r.get("fork"):
@@ -263,56 +519,165 @@ def list_all_repos():
     return sorted(repo_set)
 
 # --- repository file access helpers (use token that discovered repo when possible) ---
-def get_repo_default_branch(owner, repo):
+@lru_cache(maxsize=None)
+def get_repo_info(owner, repo):
     repo_str = f"{owner}/{repo}"
     token = repo_token_map.get(repo_str)
     try:
-        data = api_get(f"/repos/{owner}/{repo}", token=token)
-        return data.get("default_branch", "main")
+        return api_get(f"/repos/{owner}/{repo}", token=token)
     except Exception:
-        return "main"
+        return {}
 
-def get_tree(owner, repo, branch):
+def get_repo_default_branch(owner, repo):
+    return get_repo_info(owner, repo).get("default_branch", "main")
+
+REPO_OVERVIEW_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef { name target { oid } }
+    languages(first: 100) { edges { size node { name } } }
+  }
+}
+"""
+
+def get_repo_overview(owner, repo):
+    """
+    Return (default_branch, {language: bytes}, head_sha) for a repo.
+    One GraphQL query when the repo has a token; otherwise the REST repo + languages endpoints.
+    The languages are None if they could not be fetched.
+    """
+    token = repo_token_map.get(f"{owner}/{repo}")
+    if token:
+        try:
+            info = graphql(REPO_OVERVIEW_QUERY, {"owner": owner, "name": repo}, token=token).get("repository") or {}
+            ref = info.get("defaultBranchRef") or {}
+            branch = ref.get("name") or "main"
+            langs = {e["node"]["name"]: e["size"] for e in (info.get("languages") or {}).get("edges", [])}
+            return branch, langs, (ref.get("target") or {}).get("oid")
+        except Exception as e:
+            print(f"Warning: GraphQL overview failed for {owner}/{repo}, using REST: {e}")
+    branch = get_repo_default_branch(owner, repo)
+    try:
+        langs = api_get(f"/repos/{owner}/{repo}/languages", token=token)
+    except Exception:
+        langs = None
+    try:
+        head_sha = api_get(f"/repos/{owner}/{repo}/git/ref/heads/{branch}", token=token)["object"]["sha"]
+    except Exception:
+        head_sha = None
+    return branch, langs, head_sha
+
+def get_tree(owner, repo, ref):
+    """Recursive tree at `ref` (commit SHA or branch), or None if it could not be fetched."""
     repo_str = f"{owner}/{repo}"
     token = repo_token_map.get(repo_str)
     try:
-        return api_get(f"/repos/{owner}/{repo}/git/trees/{branch}", params={"recursive": "1"}, token=token)
+        # not kept in the ETag cache: a tree is only re-requested for a new commit, and can run to megabytes
+        return api_get(f"/repos/{owner}/{repo}/git/trees/{ref}", params={"recursive": "1"}, token=token, remember=False)
     except Exception:
-        return {"tree": []}
+        return None
 
-def get_file_content(owner, repo, path):
+def get_blob(owner, repo, sha):
+    """
+    Fetch a blob by the SHA from the tree listing (no server-side path resolution, no path encoding).
+    Returns None if the blob could not be fetched.
+    """
     repo_str = f"{owner}/{repo}"
     token = repo_token_map.get(repo_str)
     try:
-        r = requests.get(f"{GITHUB_API}/repos/{owner}/{repo}/contents/{urllib.parse.quote(path, safe='')}",
-                         headers=mk_headers(token=token),
-                         timeout=REQUEST_TIMEOUT)
-        if r.status_code == 200:
-            j = r.json()
-            if j.get("encoding") == "base64" and "content" in j:
-                import base64
-                return base64.b64decode(j["content"]).decode("utf-8", errors="ignore")
+        url = f"{GITHUB_API}/repos/{owner}/{repo}/git/blobs/{sha}"
+        # blobs are content-addressed: a body cached by an earlier run can never be stale
+        entry = prev_cache["etags"].get(url) or next_cache["etags"].get(url)
+        if entry:
+            next_cache["etags"][url] = entry
+            return entry["body"]
+        # raw media type: the body is the file itself (no JSON envelope / base64), and only its head is sent
+        raw = True
+        headers = dict(mk_headers(token=token), Accept="application/vnd.github.raw",
+                       Range=f"bytes=0-{MAX_FILE_BYTES - 1}")
+        r, entry = conditional_get(url, headers, token=token)
+        if r.status_code == 415:
+            raw = False
+            r, entry = conditional_get(url, mk_headers(token=token), token=token)
+        if r.status_code == 304 and entry:
+            return entry["body"]
+        if r.status_code in (200, 206):
+            if raw:
+                text = r.content[:MAX_FILE_BYTES].decode("utf-8", errors="ignore")
             else:
-                return j.get("content", "")
+                j = r.json()
+                if j.get("encoding") == "base64" and "content" in j:
+                    text = base64.b64decode(j["content"])[:MAX_FILE_BYTES].decode("utf-8", errors="ignore")
+                else:
+                    text = j.get("content", "")[:MAX_FILE_BYTES]
+            next_cache["etags"][url] = {"etag": r.headers.get("ETag", sha), "body": text}
+            return text
         else:
             return None
     except Exception:
         return None
 
-def scan_file_text_for_keywords(text, keywords_map):
-    found = set()
-    txt = (text or "").lower()
-    for k, label in keywords_map.items():
-        if k.lower() in txt:
-            found.add(label)
-    return found
+def get_file_contents_graphql(owner, repo, ref, paths):
+    """Fetch many blobs with aliased `object(expression: "ref:path")` fields; returns {path: text}."""
+    token = repo_token_map.get(f"{owner}/{repo}")
+    texts = {}
+    for i in range(0, len(paths), GRAPHQL_FILE_BATCH):
+        chunk = paths[i:i + GRAPHQL_FILE_BATCH]
+        fields = "\n".join(
+            f"f{n}: object(expression: {json.dumps(f'{ref}:{p}')}) {{ ... on Blob {{ text }} }}"
+            for n, p in enumerate(chunk)
+        )
+        query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{\n{fields}\n}} }}"
+        info = graphql(query, {"owner": owner, "name": repo}, token=token).get("repository") or {}
+        for n, p in enumerate(chunk):
+            blob = info.get(f"f{n}") or {}
+            if blob.get("text"):
+                texts[p] = blob["text"][:MAX_FILE_BYTES]
+    return texts
+
+def get_file_contents(owner, repo, ref, paths, shas):
+    """
+    Return (texts, complete): the texts of `paths` at `ref` in order (None where unavailable),
+    and whether every fetch succeeded. `shas` maps path -> blob SHA.
+    """
+    if repo_token_map.get(f"{owner}/{repo}"):
+        try:
+            texts = get_file_contents_graphql(owner, repo, ref, paths)
+            # a missing text here is a binary or absent file, not a failure (errors raise in graphql())
+            return [texts.get(p) for p in paths], True
+        except Exception as e:
+            print(f"Warning: GraphQL contents failed for {owner}/{repo}, using REST: {e}")
+    # blob fetches are pure I/O; run them concurrently (results keep path order)
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as pool:
+        texts = list(pool.map(lambda path: get_blob(owner, repo, shas[path]), paths))
+    return texts, all(t is not None for t in texts)
+
+def scan_keywords(text, detected):
+    """
+    One pass over KEYWORD_TABLE, adding each hit to its detected[...] set. `text` must be lowercased.
+    Labels already detected are not searched for again, so the scan does no work once everything is found.
+    """
+    for k, cat, label in KEYWORD_TABLE:
+        if label not in detected[cat] and k in text:
+            detected[cat].add(label)
 
 # --- detection per repo ---
 def detect_for_repo(full):
     owner, r = full.split("/", 1)
-    branch = get_repo_default_branch(owner, r)
-    tree = get_tree(owner, r, branch)
-    paths = [e["path"] for e in tree.get("tree", []) if e.get("type") == "blob"]
+    branch, langs, head_sha = get_repo_overview(owner, r)
+    # only a result built from successful fetches may be cached; a failed call would otherwise stick until the next push
+    complete = langs is not None
+    langs = langs or {}
+    # read the tree and files at the commit we key the cache on, not whatever the branch points at by then
+    ref = head_sha or branch
+    prev = prev_cache["repos"].get(full)
+    if head_sha and prev and prev.get("sha") == head_sha and prev.get("table_version") == TABLE_VERSION:
+        # same commit, same tables: reuse the last result and keep this repo's ETags warm
+        next_cache["repos"][full] = prev
+        prefix = f"{GITHUB_API}/repos/{full}/"
+        next_cache["etags"].update({k: v for k, v in prev_cache["etags"].items()
+                                    if k.startswith(prefix) and "/git/trees/" not in k})
+        return detected_from_json(prev["detected"])
     detected = {
         "languages": {},
         "frontend": set(),
@@ -321,303 +686,290 @@ def detect_for_repo(full):
         "devops": set(),
         "misc": set(),
     }
-    # languages via API
-    try:
-        repo_str = f"/repos/{owner}/{r}/languages"
-        token = repo_token_map.get(f"{owner}/{r}")
-        langs = api_get(repo_str, token=token)
-        for L in langs.keys():
-            if L in LANGUAGE_NORMALIZE:
-                detected["languages"][LANGUAGE_NORMALIZE[L]] = langs[L]
-            else:
-                detected["languages"][L] = langs[L]
-    except Exception:
-        pass
-
-    candidates_to_fetch = []
+    # languages via API, names passed straight through (forbidden ones dropped before aggregation)
+    detected["languages"] = {L: size for L, size in langs.items() if L not in FORBIDDEN_SKILLS}
+
+    if complete and not set(langs) - NON_CODE_LANGUAGES:
+        # empty or markup-only repo: no manifests worth scanning, so skip the tree and file fetches
+        # (only when the languages were actually fetched; a failed fetch still scans the tree)
+        remember_detection(full, head_sha, detected)
+        return detected
+
+    tree = get_tree(owner, r, ref)
+    if tree is None:
+        complete = False
+    shas = {e["path"]: e["sha"] for e in (tree or {}).get("tree", []) if e.get("type") == "blob"}
+    paths = list(shas)
+
+    candidates_to_fetch = set()
     for p in paths:
-        basename = os.path.basename(p).lower()
-        if basename in FILE_TOOL_MAP:
-            candidates_to_fetch.append(p)
-        if p.endswith(".tf"):
-            candidates_to_fetch.append(p)
-        if p.endswith(".sql"):
-            candidates_to_fetch.append(p)
-        if "dockerfile" in basename:
-            candidates_to_fetch.append(p)
-        if basename in {".env", ".env.example", ".env.sample", "database.yml", "database.yaml", "application.yml", "config.yml"}:
-            candidates_to_fetch.append(p)
-        if basename in {"package.json", "requirements.txt", "pyproject.toml", "pom.xml", "go.mod", "composer.json", "Gemfile", "Cargo.toml"}:
-            candidates_to_fetch.append(p)
-
-        # cloud/ops filenames
-        if any(key in basename for key in ("cloudformation", "serverless.yml", "serverless.yaml",
-                                           "azure-pipelines.yml", "cloudbuild.yaml",
-                                           "sam.yaml", "prometheus.yml", "grafana.ini",
-                                           "nginx.conf", "consul.hcl", "berksfile")):
-            candidates_to_fetch.append(p)
-        if "/recipes/" in p.lower() or basename == "metadata.rb" or basename == "berksfile":
-            candidates_to_fetch.append(p)
-        if p.lower().endswith("chart.yaml") or "/charts/" in p.lower():
-            candidates_to_fetch.append(p)
-
-    content_blob = ""
-    for path in set(candidates_to_fetch):
-        txt = get_file_content(owner, r, path)
+        lpath = p.lower()
+        if DENY_RE.search(lpath):
+            continue
+        basename = os.path.basename(lpath)
+        if basename in CANDIDATE_NAMES or CANDIDATE_BASENAME_RE.search(basename) or CANDIDATE_PATH_RE.search(lpath):
+            candidates_to_fetch.add(p)
+
+    # dependency manifests first, then shallower paths; sorted once for a stable order
+    candidates_to_fetch = sorted(
+        candidates_to_fetch,
+        key=lambda p: (os.path.basename(p).lower() not in FILE_TOOL_MAP, p.count("/"), p),
+    )[:MAX_FETCH]
+
+    texts, fetched_all = get_file_contents(owner, r, ref, candidates_to_fetch, shas)
+    complete = complete and fetched_all
+    path_to_text = dict(zip(candidates_to_fetch, texts))
+
+    # DB / frontend / service / devops detection, one file at a time (no concatenated copy of every file)
+    for txt in texts:
         if txt:
-            content_blob += "\n" + txt.lower()
-        time.sleep(0.06)
-
-    # DB detection
-    dbs_found = scan_file_text_for_keywords(content_blob, DB_KEYWORDS)
-    for d in dbs_found:
-        detected["dbs"].add(d)
-
-    # Frontend detection
-    fe_found = scan_file_text_for_keywords(content_blob, FRONTEND_KEYWORDS)
-    for f in fe_found:
-        detected["frontend"].add(f)
-
-    # Service/framework detection
-    svc_found = scan_file_text_for_keywords(content_blob, SERVICE_KEYWORDS)
-    for s in svc_found:
-        detected["services"].add(s)
-
-    # DevOps detection via DEVOPS_KEYWORDS
-    dev_found = scan_file_text_for_keywords(content_blob, DEVOPS_KEYWORDS)
-    for d in dev_found:
-        detected["devops"].add(d)
-
-    # Additional patterns
-    CLOUD_PATTERNS = {
-        'provider "aws"': "AWS",
-        'provider "google"': "GCP",
-        'provider "google-beta"': "GCP",
-        'provider "azurerm"': "Azure",
-        "cloudformation": "AWS",
-        "serverless": "AWS",
-        "sam": "AWS",
-        "gcloud": "GCP",
-        "google cloud": "GCP",
-        "azurerm": "Azure",
-        "azure-pipelines": "Azure",
-    }
-    OPS_PATTERNS = {
-        "prometheus": "Prometheus",
-        "grafana": "Grafana",
-        "nginx": "Nginx",
-        "chef": "Chef",
-        "consul": "Consul",
-        "prometheus.yml": "Prometheus",
-        "grafana.ini": "Grafana",
-        "consul.hcl": "Consul",
-        "berksfile": "Chef",
-        "recipes/": "Chef",
-    }
-
-    for k, name in CLOUD_PATTERNS.items():
-        if k in content_blob:
-            detected["devops"].add(name)
+            scan_keywords(txt.lower(), detected)
 
-    for k, name in OPS_PATTERNS.items():
-        if k in content_blob:
-            detected["devops"].add(name)
-
-    if "kubernetes" in content_blob or "k8s" in content_blob:
-        detected["devops"].add("Kubernetes")
-    if ".github/workflows" in "\n".join(paths) or "github actions" in content_blob:
+    # path-based signal: workflow files exist even when nothing in them names "github actions"
+    if any(p.startswith(".github/workflows/") for p in paths):
         detected["devops"].add("GitHub Actions")
-    if "terraform" in content_blob:
-        detected["devops"].add("Terraform")
-    if "helm" in content_blob:
-        detected["devops"].add("Helm")
-    if "prometheus" in content_blob:
-        detected["devops"].add("Prometheus")
-    if "grafana" in content_blob:
-        detected["devops"].add("Grafana")
-    if "nginx" in content_blob:
-        detected["devops"].add("Nginx")
-    if "consul" in content_blob:
-        detected["devops"].add("Consul")
-    if "chef" in content_blob or "cookbook" in content_blob:
-        detected["devops"].add("Chef")
-
-    # package.json parsing
-    if any(p.lower().endswith("package.json") for p in paths):
-        raw = get_file_content(owner, r, "package.json")
+
+    # package.json parsing (shallowest one, already fetched as a candidate)
+    pkg_path = next((p for p in candidates_to_fetch if os.path.basename(p).lower() == "package.json"), None)
+    if pkg_path:
+        raw = path_to_text.get(pkg_path)
         if raw:
             try:
-                import json
                 pj = json.loads(raw)
                 deps = {}
                 deps.update(pj.get("dependencies", {}))
                 deps.update(pj.get("devDependencies", {}))
                 dep_keys = " ".join(deps.keys()).lower()
-                fe_found2 = scan_file_text_for_keywords(dep_keys, FRONTEND_KEYWORDS)
-                for f in fe_found2:
-                    detected["frontend"].add(f)
-                svc_found2 = scan_file_text_for_keywords(dep_keys, SERVICE_KEYWORDS)
-                for s in svc_found2:
-                    detected["services"].add(s)
-                db_found2 = scan_file_text_for_keywords(dep_keys, DB_KEYWORDS)
-                for d in db_found2:
-                    detected["dbs"].add(d)
-                dev_found2 = scan_file_text_for_keywords(dep_keys, DEVOPS_KEYWORDS)
-                for dv in dev_found2:
-                    detected["devops"].add(dv)
-                for k, name in CLOUD_PATTERNS.items():
-                    if k in dep_keys:
-                        detected["devops"].add(name)
-                for k, name in OPS_PATTERNS.items():
-                    if k in dep_keys:
-                        detected["devops"].add(name)
+                scan_keywords(dep_keys, detected)
             except Exception:
                 pass
 
+    if complete:
+        remember_detection(full, head_sha, detected)
     return detected
 
+def remember_detection(full, head_sha, detected):
+    if head_sha:
+        next_cache["repos"][full] = {"sha": head_sha, "table_version": TABLE_VERSION,
+                                     "detected": detected_to_json(detected)}
+
+def detected_to_json(detected):
+    return {k: (v if isinstance(v, dict) else sorted(v)) for k, v in detected.items()}
+
+def detected_from_json(data):
+    return {k: (v if isinstance(v, dict) else set(v)) for k, v in data.items()}
+
 # --- badge generation ---
+@lru_cache(maxsize=None)
 def badge_url_for(skill_name):
     label = urllib.parse.quote(f"-{skill_name}")
     logo = urllib.parse.quote(skill_name)
     return f"https://img.shields.io/badge/{label}-000?&logo={logo}"
 
+@lru_cache(maxsize=None)
 def build_badge_md(skill_name):
     url = badge_url_for(skill_name)
     return f"![{skill_name}]({url})"
 
 # --- main aggregation & README write ---
-repos = list_all_repos()
-if not repos:
-    print("No repos found; exiting.")
-    exit(0)
-
-aggregate = {
-    "languages": Counter(),
-    "frontend": Counter(),
-    "services": Counter(),
-    "dbs": Counter(),
-    "devops": Counter(),
-    "misc": Counter(),
+README_PATH = "README.md"
+START = "<!-- SKILLS-START -->"
+END = "<!-- SKILLS-END -->"
+SECTION_RE = re.compile(re.escape(START) + r"(.*?)" + re.escape(END), re.DOTALL)
+
+# detected/aggregate key -> README category heading
+CATEGORY_OF_KEY = {
+    "languages": "Programming languages",
+    "frontend": "Frontend development",
+    "services": "Services & Frameworks",
+    "dbs": "Databases",
+    "devops": "DevOps",
 }
 
-for full in repos:
+def new_aggregate():
+    return {
+        "languages": Counter(),
+        "frontend": Counter(),
+        "services": Counter(),
+        "dbs": Counter(),
+        "devops": Counter(),
+        "misc": Counter(),
+    }
+
+def detect_or_none(full):
     try:
-        det = detect_for_repo(full)
+        return detect_for_repo(full)
     except Exception as e:
         print(f"Error detecting {full}: {e}")
-        continue
-    for lang in det.get("languages", {}).keys():
-        aggregate["languages"][lang] += 1
-    for f in det.get("frontend", []):
-        aggregate["frontend"][f] += 1
-    for s in det.get("services", []):
-        aggregate["services"][s] += 1
-    for d in det.get("dbs", []):
-        aggregate["dbs"][d] += 1
-    for dv in det.get("devops", []):
-        aggregate["devops"][dv] += 1
-
-def add_skill(category, name):
-    if name in PACKAGE_MANAGERS:
-        return
-    if name in FORBIDDEN_SKILLS:
-        return
-    category_map[category][name] += 1
-
-for lang, _ in aggregate["languages"].most_common():
-    add_skill("Programming languages", lang)
-
-for f, _ in aggregate["frontend"].most_common():
-    add_skill("Frontend development", f)
-
-for s, _ in aggregate["services"].most_common():
-    add_skill("Services & Frameworks", s)
-
-for d, _ in aggregate["dbs"].most_common():
-    add_skill("Databases", d)
-
-for dv, _ in aggregate["devops"].most_common():
-    add_skill("DevOps", dv)
-
-sections = []
-order_of_categories = [
-    "Programming languages",
-    "Frontend development",
-    "Misc tools",
-    "Services & Frameworks",
-    "Databases",
-    "DevOps"
-]
-
-for cat in order_of_categories:
-    counter = category_map[cat]
-    if not counter:
-        continue
-    items = [k for k, _ in counter.most_common()]
-    badges = []
-    for it in items:
-        md = build_badge_md(it)
-        if md:
-            badges.append(md)
-    if badges:
-        sections.append(f"### {cat}\n\n{' '.join(badges)}\n")
-
-if not sections:
-    new_section = "## 🛠️ My Skills\n\n_No detected skills._\n"
-else:
-    new_section = "## 🛠️ My Skills\n\n" + "\n\n".join(sections)
-
-README_PATH = "README.md"
-START = "<!-- SKILLS-START -->"
-END = "<!-- SKILLS-END -->"
+        return None
 
-if not os.path.exists(README_PATH):
-    print("README.md not found. Creating new README.md with skills section.")
-    with open(README_PATH, "w", encoding="utf-8") as f:
-        f.write(START + "\n" + new_section + "\n" + END + "\n")
-else:
+def aggregate_repos(repos):
+    # repos are independent and I/O-bound: analyze them concurrently, then aggregate in repo order
+    with ThreadPoolExecutor(max_workers=REPO_CONCURRENCY) as pool:
+        results = list(pool.map(detect_or_none, repos))
+
+    aggregate = new_aggregate()
+    for det in results:
+        if det is None:
+            continue
+        for key in CATEGORY_OF_KEY:
+            aggregate[key].update(list(det.get(key, ())))
+    return aggregate
+
+def load_aggregates(paths):
+    """Merge aggregate JSON files written by --output (one per shard)."""
+    aggregate = new_aggregate()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for key, counts in data.items():
+            aggregate.setdefault(key, Counter()).update(counts)
+    return aggregate
+
+def visible_skills(names):
+    """Drop package managers and forbidden skills, keeping the order of `names`."""
+    return [n for n in names if n not in PACKAGE_MANAGERS and n not in FORBIDDEN_SKILLS]
+
+def build_skills_section(aggregate):
+    items_by_cat = {}
+    for key, cat in CATEGORY_OF_KEY.items():
+        # most repos first, ties by name: set order varies with the hash seed, and the unchanged check needs stable output
+        ranked = sorted(aggregate[key].items(), key=lambda kv: (-kv[1], kv[0]))
+        items_by_cat[cat] = visible_skills(k for k, _ in ranked)
+    # a skill can show up under several categories; resolve each badge once
+    resolved = {s: build_badge_md(s) for s in set().union(*items_by_cat.values())}
+
+    sections = []
+    order_of_categories = [
+        "Programming languages",
+        "Frontend development",
+        "Misc tools",
+        "Services & Frameworks",
+        "Databases",
+        "DevOps"
+    ]
+
+    for cat in order_of_categories:
+        items = items_by_cat.get(cat, [])
+        if not items:
+            continue
+        badges = [resolved[it] for it in items if resolved[it]]
+        if badges:
+            sections.append(f"### {cat}\n\n{' '.join(badges)}\n")
+
+    if not sections:
+        return "## 🛠️ My Skills\n\n_No detected skills._\n"
+    return "## 🛠️ My Skills\n\n" + "\n\n".join(sections)
+
+def current_skills_section():
+    """Return the text currently between the README markers, or None if there is no such block."""
+    if not os.path.exists(README_PATH):
+        return None
     with open(README_PATH, "r", encoding="utf-8") as f:
         text = f.read()
-    if START in text and END in text:
-        before, rest = text.split(START, 1)
-        _, after = rest.split(END, 1)
-        new_text = before + START + "\n" + new_section + "\n" + END + after
+    m = SECTION_RE.search(text)
+    return m.group(1) if m else None
+
+def write_readme(new_section):
+    if not os.path.exists(README_PATH):
+        print("README.md not found. Creating new README.md with skills section.")
+        with open(README_PATH, "w", encoding="utf-8") as f:
+            f.write(START + "\n" + new_section + "\n" + END + "\n")
     else:
-        new_text = text + "\n\n" + START + "\n" + new_section + "\n" + END + "\n"
-    with open(README_PATH, "w", encoding="utf-8") as f:
-        f.write(new_text)
-
-# commit & push (safe: skip if no changes)
-import subprocess, sys
+        with open(README_PATH, "r", encoding="utf-8") as f:
+            text = f.read()
+        block = START + "\n" + new_section + "\n" + END
+        new_text, n = SECTION_RE.subn(lambda _: block, text, count=1)
+        if n == 0:
+            new_text = text + "\n\n" + START + "\n" + new_section + "\n" + END + "\n"
+        with open(README_PATH, "w", encoding="utf-8") as f:
+            f.write(new_text)
+
+def commit_and_push():
+    """Commit & push README (safe: skip if no changes)."""
+    try:
+        subprocess.run(["git", "config", "user.name", "github-actions"], check=True)
+        subprocess.run(["git", "config", "user.email", "github-actions@users.noreply.github.com"], check=True)
 
-try:
-    subprocess.run(["git", "config", "user.name", "github-actions"], check=True)
-    subprocess.run(["git", "config", "user.email", "github-actions@users.noreply.github.com"], check=True)
+        subprocess.run(["git", "add", README_PATH], check=True)
+        if subprocess.run(["git", "diff", "--cached", "--quiet"]).returncode == 0:
+            print("No changes to commit. Skipping commit and push.")
+            return
 
-    subprocess.run(["git", "add", README_PATH], check=True)
-    status = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True, check=True)
-    if not status.stdout.strip():
-        print("No changes to commit. Skipping commit and push.")
-        sys.exit(0)
+        subprocess.run(["git", "commit", "-m", "chore: update categorized My Skills badges [skip ci]"], check=True)
 
-    subprocess.run(["git", "commit", "-m", "chore: update categorized My Skills badges [skip ci]"], check=True)
+        push_token = (TOKENS[0] if TOKENS else None) or os.getenv("GITHUB_TOKEN")
+        if not push_token:
+            print("No token available to push changes. Please set ACCESS_TOKENS or ACCESS_TOKEN or GITHUB_TOKEN.")
+            return
 
-    push_token = (TOKENS[0] if TOKENS else None) or os.getenv("GITHUB_TOKEN")
-    if not push_token:
-        print("No token available to push changes. Please set ACCESS_TOKENS or ACCESS_TOKEN or GITHUB_TOKEN.")
-        sys.exit(0)
+        branch = os.getenv("GITHUB_REF_NAME") or "main"
+        repo_url = f"https://{push_token}@github.com/{OWNER}/{REPO}.git"
 
-    branch = os.getenv("GITHUB_REF_NAME") or "main"
-    repo_url = f"https://{push_token}@github.com/{OWNER}/{REPO}.git"
+        subprocess.run(["git", "push", repo_url, f"HEAD:refs/heads/{branch}"], check=True)
+        print("README updated and pushed successfully.")
+    except subprocess.CalledProcessError as e:
+        print("Git error (commit/push):", e)
+        try:
+            subprocess.run(["git", "status"], check=False)
+            subprocess.run(["git", "log", "-1", "--oneline"], check=False)
+        except Exception:
+            pass
+        sys.exit(1)
 
-    subprocess.run(["git", "push", repo_url, f"HEAD:refs/heads/{branch}"], check=True)
-    print("README updated and pushed successfully.")
-except subprocess.CalledProcessError as e:
-    print("Git error (commit/push):", e)
+def parse_shard(value):
     try:
-        subprocess.run(["git", "status"], check=False)
-        subprocess.run(["git", "log", "-1", "--oneline"], check=False)
-    except Exception:
-        pass
-    sys.exit(1)
+        index, count = (int(x) for x in value.split("/", 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index out of range: {value!r}")
+    return index, count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the My Skills section of README.md.")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="only analyze repos[I::N]; requires --output (the README needs every shard)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="write the aggregated counts as JSON to PATH instead of updating README")
+    parser.add_argument("--merge", nargs="+", metavar="PATH",
+                        help="skip detection and build README from aggregate JSON files")
+    args = parser.parse_args(argv)
+    if args.shard and not args.output:
+        parser.error("--shard requires --output: a single shard must not rewrite the README")
+    if args.shard and args.merge:
+        parser.error("--shard and --merge cannot be combined")
+
+    if args.merge:
+        aggregate = load_aggregates(args.merge)
+    else:
+        # loaded before listing so the repo listing pages are conditional requests too
+        load_cache()
+        repos = list_all_repos()
+        if args.shard:
+            index, count = args.shard
+            repos = repos[index::count]
+        if not repos:
+            print("No repos found; exiting.")
+            return
+        aggregate = aggregate_repos(repos)
+        if not args.shard:
+            # a shard only saw its own repos; saving would drop every other repo from the shared cache
+            save_cache()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(aggregate, f, ensure_ascii=False, indent=2)
+        print(f"Wrote aggregate to {args.output}.")
+        return
+
+    new_section = build_skills_section(aggregate)
+    existing = current_skills_section()
+    if existing is not None and existing.strip() == new_section.strip():
+        print("Skills section unchanged. Skipping README write, commit and push.")
+        return
+    write_readme(new_section)
+    commit_and_push()
+
+if __name__ == "__main__":
+    main()